@@ -1,34 +1,81 @@
-from flask import Flask, render_template, request, jsonify, send_file
+import eventlet
+eventlet.monkey_patch()
+
+from flask import Flask, render_template, request, jsonify, send_file, Response
 from flask_socketio import SocketIO, emit
 import pandas as pd
-import json
+import atexit
+import orjson
+import sqlite3
 import threading
 import time
 import io
 import random
+import unicodedata
+import msgspec
 import numpy as np
-from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from itertools import repeat
+from typing import Optional
+from urllib.parse import quote
+from services.kernels import regress, rolling_zscore
 
 class Config:
     SECRET_KEY = 'quant-dev-secret-key-2024'
     DATABASE_PATH = 'tick_data.db'
     DEFAULT_SYMBOLS = ['btcusdt', 'ethusdt', 'adausdt', 'solusdt']
+    MAX_BUFFER_SIZE = 5000
+    EMIT_BATCH_SIZE = 32
+    EMIT_MAX_DELAY = 0.05
+    ASOF_TOLERANCE_MS = 1000
 
 class Database:
+    FLUSH_BATCH_SIZE = 1000
+    FLUSH_INTERVAL = 0.1
+    # 1: tick timestamps are INTEGER epoch milliseconds
+    SCHEMA_VERSION = 1
+    TICK_CACHE_SIZE = 64
+    PRAGMAS = (
+        'journal_mode=WAL',
+        'synchronous=NORMAL',
+        'mmap_size=268435456',
+        'cache_size=-65536',
+        'temp_store=MEMORY',
+        'wal_autocheckpoint=10000',
+    )
+
     def __init__(self, db_path):
         self.db_path = db_path
+        self._write_lock = threading.Lock()
+        # One shared reader: under eventlet every request runs on a fresh greenthread,
+        # so per-thread readers would open (and keep) a connection per request
+        self._read_lock = threading.Lock()
+        self._reader = None
+        
+        # Per-symbol write counters; get_recent_ticks results are cached against them
+        self._versions = {}
+        # (symbol, limit) -> (version, frame), least recently used first
+        self._tick_cache = OrderedDict()
         self.init_database()
+        
+        # Ticks are queued here and written in batches by a background flusher
+        self.write_queue = deque()
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
     
     def init_database(self):
-        import sqlite3
-        conn = sqlite3.connect(self.db_path)
+        # Long-lived connection shared by the batched writer
+        conn = self._connect()
+        self._write_conn = conn
         cursor = conn.cursor()
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS ticks (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 symbol TEXT NOT NULL,
-                timestamp DATETIME NOT NULL,
+                timestamp INTEGER NOT NULL,
                 price REAL NOT NULL,
                 size REAL NOT NULL,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP
@@ -36,62 +83,214 @@ class Database:
         ''')
         
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticks_symbol_time ON ticks(symbol, timestamp)')
+        
+        # Timestamps are stored as epoch milliseconds. Older databases hold
+        # naive local-time ISO strings; convert them once, going through 'utc' so the
+        # host's offset is removed, and record it in user_version
+        if cursor.execute('PRAGMA user_version').fetchone()[0] < self.SCHEMA_VERSION:
+            cursor.execute('''
+                UPDATE ticks
+                SET timestamp = CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+                WHERE typeof(timestamp) = 'text'
+            ''')
+            cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
         conn.commit()
-        conn.close()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in self.PRAGMAS:
+            conn.execute(f'PRAGMA {pragma}')
+        return conn
+    
+    def _read_conn(self):
+        # Callers must hold _read_lock; WAL lets reads run alongside the writer
+        if self._reader is None:
+            self._reader = self._connect()
+        return self._reader
     
     def save_tick(self, symbol, timestamp, price, size):
-        import sqlite3
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO ticks (symbol, timestamp, price, size) VALUES (?, ?, ?, ?)',
-            (symbol, timestamp, price, size)
-        )
-        conn.commit()
-        conn.close()
+        self.write_queue.append((symbol, timestamp, price, size))
+        if len(self.write_queue) >= self.FLUSH_BATCH_SIZE:
+            self._flush_event.set()
+    
+    def save_ticks_bulk(self, rows):
+        """Insert (symbol, timestamp, price, size) rows in one transaction, bypassing the queue.
+        Raises if the insert fails."""
+        self._insert_rows(rows)
+    
+    def flush(self):
+        """Write all queued ticks, one transaction per batch. A batch that fails on
+        bad data is retried row by row and the bad rows are logged and dropped; any
+        other failure puts the batch back at the front of the queue for the next flush."""
+        written = 0
+        while self.write_queue:
+            rows = []
+            while self.write_queue and len(rows) < self.FLUSH_BATCH_SIZE:
+                rows.append(self.write_queue.popleft())
+            try:
+                self._insert_rows(rows)
+            except (sqlite3.IntegrityError, sqlite3.InterfaceError):
+                written += self._insert_each(rows)
+                continue
+            except Exception as e:
+                print(f"Tick flush error, {len(rows)} rows re-queued: {e}")
+                self.write_queue.extendleft(reversed(rows))
+                break
+            written += len(rows)
+        return written
+    
+    def _insert_each(self, rows):
+        written = 0
+        for row in rows:
+            try:
+                self._insert_rows([row])
+                written += 1
+            except Exception as e:
+                print(f"Dropping tick {row}: {e}")
+        return written
+    
+    def _insert_rows(self, rows):
+        with self._write_lock, self._write_conn:
+            self._write_conn.executemany(
+                'INSERT INTO ticks (symbol, timestamp, price, size) VALUES (?, ?, ?, ?)',
+                rows
+            )
+        
+        # Only committed rows invalidate cached reads
+        for symbol in {row[0] for row in rows}:
+            self._versions[symbol] = self._versions.get(symbol, 0) + 1
+    
+    def _flush_loop(self):
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.FLUSH_INTERVAL)
+            self._flush_event.clear()
+            self.flush()
+    
+    def close(self):
+        # Stop the flusher first so it cannot pop rows and then hit a closed connection
+        self._stop_event.set()
+        self._flush_event.set()
+        self._flusher.join()
+        self.flush()
+        with self._write_lock:
+            self._write_conn.close()
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
     
     def get_recent_ticks(self, symbol, limit=1000):
-        import sqlite3
-        conn = sqlite3.connect(self.db_path)
+        """Latest ticks in ascending time order.
+
+        Results are cached until the next write for the symbol, so callers
+        must treat the returned DataFrame as read-only.
+        """
+        key = (symbol, limit)
+        version = self._versions.get(symbol, 0)
+        cached = self._tick_cache.get(key)
+        if cached is not None and cached[0] == version:
+            self._tick_cache.move_to_end(key)
+            return cached[1]
+        
         query = 'SELECT timestamp, price, size FROM ticks WHERE symbol = ? ORDER BY timestamp DESC LIMIT ?'
-        df = pd.read_sql_query(query, conn, params=[symbol, limit])
-        conn.close()
-        # Sort back to ascending time for charts
-        return df.sort_values(by='timestamp', ascending=True)
+        with self._read_lock:
+            df = pd.read_sql_query(query, self._read_conn(), params=[symbol, limit])
+        # Rows come back newest-first; reverse to ascending time for charts
+        df = df.iloc[::-1].reset_index(drop=True)
+        # Fixed dtypes even when no rows match; empty results come back as object
+        # columns, which orjson's numpy serializer rejects
+        df = df.astype({'timestamp': np.int64, 'price': np.float64, 'size': np.float64}, copy=False)
+        # Bounded: symbol comes straight from request query strings
+        self._tick_cache[key] = (version, df)
+        self._tick_cache.move_to_end(key)
+        if len(self._tick_cache) > self.TICK_CACHE_SIZE:
+            self._tick_cache.popitem(last=False)
+        return df
+
+class BinanceTrade(msgspec.Struct):
+    """Fields of a Binance trade event the dashboard uses; the rest are skipped"""
+    e: str
+    E: int
+    s: str
+    p: float
+    q: float
+
+class BinanceStreamEvent(msgspec.Struct):
+    # Subscription acks on the combined stream carry no data
+    data: Optional[BinanceTrade] = None
+
+# Lax mode parses Binance's quoted price/quantity strings straight into floats
+stream_decoder = msgspec.json.Decoder(BinanceStreamEvent, strict=False)
 
 class BinanceDataIngestion:
-    def __init__(self, db, symbols=None):
+    STREAM_URL = "wss://fstream.binance.com/stream?streams="
+    
+    def __init__(self, db, symbols=None, buffer_size=5000, emit_batch_size=32):
         self.db = db
         self.symbols = symbols or []
-        self.ws_connections = {}
+        self.ws = None
+        self._request_id = 0
+        # Symbols added while the socket is not yet open, sent from on_open
+        self._pending_subs = []
+        self._sub_lock = threading.Lock()
         self.is_running = False
-        self.buffer = []
         self.buffer_lock = threading.Lock()
         self.callbacks = []
         
+        # Signalled when the first pending tick arrives and when a full batch is ready
+        self.emit_batch_size = emit_batch_size
+        self._buffer_ready = threading.Condition(self.buffer_lock)
+        
+        # Columnar ring buffer of recent ticks; _head counts every tick written
+        # and _tail marks the last clear, both as absolute positions
+        self.buffer_size = buffer_size
+        self._ts = np.empty(buffer_size, dtype=np.int64)
+        self._price = np.empty(buffer_size, dtype=np.float64)
+        self._size = np.empty(buffer_size, dtype=np.float64)
+        self._sym = np.empty(buffer_size, dtype=np.int16)
+        self._symbol_ids = {}
+        self._symbol_names = []
+        self._head = 0
+        self._tail = 0
+        
     def add_callback(self, callback):
         self.callbacks.append(callback)
     
-    def normalize_tick(self, data):
+    def normalize_tick(self, trade):
         return {
-            'symbol': data['s'].lower(),
-            'timestamp': datetime.fromtimestamp(data['E'] / 1000).isoformat(),
-            'price': float(data['p']),
-            'size': float(data['q'])
+            'symbol': trade.s.lower(),
+            'timestamp': trade.E,
+            'price': trade.p,
+            'size': trade.q
         }
     
+    def _symbol_id(self, symbol):
+        sid = self._symbol_ids.get(symbol)
+        if sid is None:
+            sid = len(self._symbol_names)
+            self._symbol_ids[symbol] = sid
+            self._symbol_names.append(symbol)
+        return sid
+    
     def on_message(self, ws, message):
         try:
-            data = json.loads(message)
-            if data.get('e') == 'trade':
-                tick = self.normalize_tick(data)
+            # Combined streams wrap each event as {"stream": ..., "data": {...}}
+            trade = stream_decoder.decode(message).data
+            if trade is not None and trade.e == 'trade':
+                tick = self.normalize_tick(trade)
                 
                 self.db.save_tick(tick['symbol'], tick['timestamp'], tick['price'], tick['size'])
                 
                 with self.buffer_lock:
-                    self.buffer.append(tick)
-                    if len(self.buffer) > 1000:
-                        self.buffer.pop(0)
+                    i = self._head % self.buffer_size
+                    self._ts[i] = tick['timestamp']
+                    self._price[i] = tick['price']
+                    self._size[i] = tick['size']
+                    self._sym[i] = self._symbol_id(tick['symbol'])
+                    self._head += 1
+                    pending = self._head - self._tail
+                    if pending == 1 or pending == self.emit_batch_size:
+                        self._buffer_ready.notify()
                 
                 for callback in self.callbacks:
                     callback(tick)
@@ -107,72 +306,185 @@ class BinanceDataIngestion:
     
     def on_open(self, ws):
         print("WebSocket connection opened")
+        self._send_pending_subs()
     
     def start_symbol(self, symbol):
-        if symbol in self.ws_connections:
+        """Subscribe a symbol on the combined stream"""
+        with self._sub_lock:
+            if symbol in self.symbols or symbol in self._pending_subs:
+                return
+            if self.ws is None:
+                # Not connected yet; start() builds the stream URL from self.symbols
+                self.symbols.append(symbol)
+                return
+            self._pending_subs.append(symbol)
+        self._send_pending_subs()
+    
+    def _send_pending_subs(self):
+        """SUBSCRIBE queued symbols; a symbol joins self.symbols only once its send succeeds"""
+        with self._sub_lock:
+            while self._pending_subs and self.ws is not None:
+                symbol = self._pending_subs[0]
+                self._request_id += 1
+                try:
+                    self.ws.send(orjson.dumps({
+                        'method': 'SUBSCRIBE',
+                        'params': [f"{symbol}@trade"],
+                        'id': self._request_id
+                    }).decode())
+                except Exception as e:
+                    # Usually the socket is not open yet; on_open retries the queue
+                    print(f"Subscribe error for {symbol}: {e}")
+                    return
+                self._pending_subs.pop(0)
+                self.symbols.append(symbol)
+    
+    def start(self, symbols):
+        if self.ws is not None:
             return
-            
-        import websocket
-        ws_url = f"wss://fstream.binance.com/ws/{symbol}@trade"
-        ws = websocket.WebSocketApp(
-            ws_url,
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close,
-            on_open=self.on_open
-        )
         
-        def run_websocket():
-            ws.run_forever()
+        self.is_running = True
         
-        thread = threading.Thread(target=run_websocket)
+        import websocket
+        with self._sub_lock:
+            # Keep symbols added before start() or left unsubscribed by a previous run
+            self.symbols = list(dict.fromkeys([*self.symbols, *self._pending_subs, *symbols]))
+            self._pending_subs.clear()
+            
+            ws_url = self.STREAM_URL + '/'.join(f"{symbol}@trade" for symbol in self.symbols)
+            self.ws = websocket.WebSocketApp(
+                ws_url,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close,
+                on_open=self.on_open
+            )
+        
+        thread = threading.Thread(target=self.ws.run_forever, kwargs={'skip_utf8_validation': True})
         thread.daemon = True
         thread.start()
-        
-        self.ws_connections[symbol] = ws
-    
-    def start(self, symbols):
-        self.symbols = symbols
-        self.is_running = True
-        for symbol in symbols:
-            self.start_symbol(symbol)
-            time.sleep(0.1)
     
     def stop(self):
         self.is_running = False
-        for ws in self.ws_connections.values():
-            ws.close()
-        self.ws_connections.clear()
+        if self.ws is not None:
+            self.ws.close()
+            self.ws = None
+    
+    def _ring_slice(self, arr, start, stop):
+        a = start % self.buffer_size
+        b = stop % self.buffer_size
+        if stop - start == self.buffer_size or a > b:
+            return np.concatenate((arr[a:], arr[:b]))
+        return np.ascontiguousarray(arr[a:b])
+    
+    def wait_for_batch(self, max_delay):
+        """Block until ticks are pending, then until a full batch is ready or
+        max_delay seconds have passed, and drain the buffer"""
+        with self._buffer_ready:
+            self._buffer_ready.wait_for(lambda: self._head > self._tail)
+            self._buffer_ready.wait_for(
+                lambda: self._head - self._tail >= self.emit_batch_size,
+                timeout=max_delay
+            )
+        return self.get_recent_buffer(clear=True)
     
     def get_recent_buffer(self, clear=False):
+        """Ticks since the last clear as contiguous column arrays"""
         with self.buffer_lock:
-            buffer_copy = self.buffer.copy()
+            start = max(self._tail, self._head - self.buffer_size)
+            stop = self._head
+            sym = self._ring_slice(self._sym, start, stop)
+            names = np.array(self._symbol_names or [''])
+            buffer_copy = {
+                'symbol': names[sym],
+                'timestamp': self._ring_slice(self._ts, start, stop),
+                'price': self._ring_slice(self._price, start, stop),
+                'size': self._ring_slice(self._size, start, stop)
+            }
             if clear:
-                self.buffer.clear()
+                self._tail = stop
         return buffer_copy
 
+class RollingPairMoments:
+    """Windowed Welford moments of a price pair, updated one point at a time.
+
+    The spread y - b*x has mean mean_y - b*mean_x and variance
+    (m2_y - 2b*c_xy + b^2*m2_x) / n, so its z-score can be read in O(1)
+    for whatever hedge ratio the latest regression produced.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.points = deque()
+        self.last_timestamp = None
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.c_xy = 0.0
+    
+    def push(self, x, y):
+        self.points.append((x, y))
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self.m2_x += dx * (x - self.mean_x)
+        self.m2_y += dy * (y - self.mean_y)
+        self.c_xy += dx * (y - self.mean_y)
+        
+        if self.n > self.window:
+            self._evict(*self.points.popleft())
+    
+    def _evict(self, x, y):
+        # Exact inverse of push
+        self.n -= 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x -= dx / self.n
+        self.mean_y -= dy / self.n
+        self.m2_x -= dx * (x - self.mean_x)
+        self.m2_y -= dy * (y - self.mean_y)
+        self.c_xy -= dx * (y - self.mean_y)
+    
+    def spread_zscore(self, hedge_ratio):
+        x, y = self.points[-1]
+        mean = self.mean_y - hedge_ratio * self.mean_x
+        var = (self.m2_y - 2 * hedge_ratio * self.c_xy + hedge_ratio * hedge_ratio * self.m2_x) / self.n
+        std = np.sqrt(max(var, 0.0))
+        zscore = (y - hedge_ratio * x - mean) / std if std > 0 else 0
+        return {
+            'current_zscore': float(zscore),
+            'mean': float(mean),
+            'std': float(std)
+        }
+
 class QuantitativeAnalytics:
+    WELFORD_CACHE_SIZE = 64
+    
     def __init__(self, db):
         self.db = db
+        # RollingPairMoments keyed by (symbol1, symbol2, window), least recently used first;
+        # bounded because all three come from the request
+        self._welford = OrderedDict()
+        self._welford_lock = threading.Lock()
     
     def resample_ticks(self, df, interval='1min'):
         if df.empty or len(df) < 5:
             return pd.DataFrame()
             
         try:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df.set_index('timestamp', inplace=True)
-            
-            # Simple resampling without complex OHLC
-            if len(df) < 10:
-                # Just use the last price in each interval
-                resampled = df['price'].resample(interval).last().to_frame('close')
-            else:
-                resampled = df['price'].resample(interval).ohlc()
-                resampled.columns = ['open', 'high', 'low', 'close']
+            df = df.set_index(pd.to_datetime(df['timestamp'], unit='ms'))
             
-            volume = df['size'].resample(interval).sum()
-            resampled['volume'] = volume
+            # One grouping pass for both the OHLC bars and the volume
+            resampled = df.resample(interval).agg(
+                open=('price', 'first'),
+                high=('price', 'max'),
+                low=('price', 'min'),
+                close=('price', 'last'),
+                volume=('size', 'sum')
+            )
             resampled = resampled.dropna()
             return resampled.reset_index()
             
@@ -180,11 +492,8 @@ class QuantitativeAnalytics:
             print(f"Resampling error: {e}")
             return pd.DataFrame()
     
-    def pairwise_regression(self, symbol1, symbol2, timeframe='1min'):
+    def pairwise_regression(self, df1, df2, timeframe='1min'):
         try:
-            df1 = self.db.get_recent_ticks(symbol1, 200)
-            df2 = self.db.get_recent_ticks(symbol2, 200)
-            
             if df1.empty or df2.empty or len(df1) < 5 or len(df2) < 5:
                 # Return demo data if insufficient real data
                 return {
@@ -245,15 +554,12 @@ class QuantitativeAnalytics:
                     'spread_std': 1
                 }
                 
-            # Calculate regression coefficients manually
-            n = len(X)
-            sum_x = np.sum(X)
-            sum_y = np.sum(y)
-            sum_xy = np.sum(X * y)
-            sum_x2 = np.sum(X * X)
+            slope, intercept, r_squared, current_spread, spread_mean, spread_std = regress(
+                np.ascontiguousarray(X, dtype=np.float64),
+                np.ascontiguousarray(y, dtype=np.float64)
+            )
             
-            denominator = n * sum_x2 - sum_x * sum_x
-            if denominator == 0:
+            if np.isnan(slope):
                 return {
                     'hedge_ratio': 1.0,
                     'r_squared': 0.5,
@@ -261,25 +567,14 @@ class QuantitativeAnalytics:
                     'spread_mean': 0,
                     'spread_std': 1
                 }
-                
-            slope = (n * sum_xy - sum_x * sum_y) / denominator
-            intercept = (sum_y - slope * sum_x) / n
-            
-            # Calculate R-squared
-            y_pred = slope * X + intercept
-            ss_res = np.sum((y - y_pred) ** 2)
-            ss_tot = np.sum((y - np.mean(y)) ** 2)
-            r_squared = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0
-            
-            spread = y - slope * X
             
             return {
                 'hedge_ratio': float(slope),
                 'intercept': float(intercept),
                 'r_squared': float(r_squared),
-                'spread_mean': float(np.mean(spread)) if len(spread) > 0 else 0,
-                'spread_std': float(np.std(spread)) if len(spread) > 0 else 1,
-                'current_spread': float(spread[-1]) if len(spread) > 0 else 0
+                'spread_mean': float(spread_mean),
+                'spread_std': float(spread_std),
+                'current_spread': float(current_spread)
             }
             
         except Exception as e:
@@ -301,7 +596,7 @@ class QuantitativeAnalytics:
                     'std': 1
                 }
             
-            spread_series = np.array(spread_series)
+            spread_series = np.asarray(spread_series, dtype=np.float64)
             if len(spread_series) < window:
                 window = len(spread_series)
             
@@ -312,19 +607,13 @@ class QuantitativeAnalytics:
                     'std': float(np.std(spread_series)) if len(spread_series) > 0 else 1
                 }
             
-            recent_spread = spread_series[-window:]
-            mean = np.mean(recent_spread)
-            std = np.std(recent_spread)
-            
-            if std == 0:
-                zscore = 0
-            else:
-                zscore = (spread_series[-1] - mean) / std
+            # Only the latest window is needed for the current z-score
+            zscore, mean, std = rolling_zscore(spread_series[-window:], window, 0)
             
             return {
-                'current_zscore': float(zscore),
-                'mean': float(mean),
-                'std': float(std)
+                'current_zscore': float(zscore[-1]),
+                'mean': float(mean[-1]),
+                'std': float(std[-1])
             }
         except Exception as e:
             print(f"Z-score calculation error: {e}")
@@ -334,6 +623,38 @@ class QuantitativeAnalytics:
                 'std': 1
             }
     
+    def pair_spread_zscore(self, symbol1, symbol2, merged, hedge_ratio, window=20):
+        """Spread z-score from incrementally maintained pair moments.
+
+        merged holds as-of joined ticks (timestamp, price_1, price_2); only rows
+        newer than the last call are folded into the state.
+        """
+        # A window under 2 has no variance, and eviction would divide by zero
+        window = max(2, int(window))
+        with self._welford_lock:
+            key = (symbol1, symbol2, window)
+            state = self._welford.get(key)
+            if state is None:
+                state = self._welford[key] = RollingPairMoments(window)
+                if len(self._welford) > self.WELFORD_CACHE_SIZE:
+                    self._welford.popitem(last=False)
+            else:
+                self._welford.move_to_end(key)
+            
+            timestamps = merged['timestamp'].to_numpy()
+            start = 0
+            if state.last_timestamp is not None:
+                start = int(np.searchsorted(timestamps, state.last_timestamp, side='right'))
+            if start < len(timestamps):
+                for x, y in zip(merged['price_1'].to_numpy()[start:].tolist(),
+                                merged['price_2'].to_numpy()[start:].tolist()):
+                    state.push(x, y)
+                state.last_timestamp = timestamps[-1]
+            
+            if state.n < 2:
+                return None
+            return state.spread_zscore(hedge_ratio)
+    
     def rolling_correlation(self, symbol1, symbol2, window=20, timeframe='1min'):
         try:
             return {
@@ -364,19 +685,18 @@ class TestDataGenerator:
             'solusdt': 150
         }
         
+        # Fluctuate around each base price; one vectorized draw per symbol
+        rng = np.random.default_rng()
+        now_ms = int(time.time() * 1000)
+        timestamps = (now_ms - np.arange(100, 0, -1, dtype=np.int64) * 60_000).tolist()
+        rows = []
         for symbol in symbols:
             base_price = base_prices.get(symbol, 100)
-            for i in range(100):
-                timestamp = (datetime.now() - timedelta(minutes=100-i)).isoformat()
-                
-                # --- MODIFICATION ---
-                # This now fluctuates around the base_price instead of drifting
-                price = base_price * (1 + random.uniform(-0.01, 0.01))
-                # --- END MODIFICATION ---
-                
-                size = random.uniform(0.1, 5.0)
-                self.db.save_tick(symbol, timestamp, price, size)
-                
+            prices = base_price * (1 + rng.uniform(-0.01, 0.01, 100))
+            sizes = rng.uniform(0.1, 5.0, 100)
+            rows.extend(zip(repeat(symbol), timestamps, prices.tolist(), sizes.tolist()))
+        
+        self.db.save_ticks_bulk(rows)
         print(f"Generated test data for {len(symbols)} symbols")
     
     def start_live_test_data(self, symbols=None):
@@ -392,7 +712,7 @@ class TestDataGenerator:
             }
             
             while self.is_running:
-                ticks_to_emit = []
+                batch = {'sym': [], 't': [], 'p': [], 'q': []}
                 for symbol in symbols:
                     # --- MODIFICATION ---
                     # This now fluctuates around the base_price instead of drifting
@@ -401,39 +721,44 @@ class TestDataGenerator:
                     # --- END MODIFICATION ---
 
                     size = random.uniform(0.1, 2.0)
-                    timestamp = datetime.now().isoformat()
+                    timestamp = int(time.time() * 1000)
                     
                     self.db.save_tick(symbol, timestamp, price, size)
                     
-                    ticks_to_emit.append({
-                        'symbol': symbol,
-                        'timestamp': timestamp,
-                        'price': price,
-                        'size': size
-                    })
+                    batch['sym'].append(symbol)
+                    batch['t'].append(timestamp)
+                    batch['p'].append(price)
+                    batch['q'].append(size)
                 
-                socketio.emit('tick_data', ticks_to_emit)
+                socketio.emit('ticks', batch)
                 time.sleep(2)
         
-        self.thread = threading.Thread(target=generate_loop)
-        self.thread.daemon = True
-        self.thread.start()
+        self.thread = socketio.start_background_task(generate_loop)
         print("Started live test data generation")
     
     def stop_live_test_data(self):
         self.is_running = False
         if self.thread:
-            self.thread.join(timeout=1)
+            # Background tasks are green threads whose join() takes no timeout;
+            # bound the wait so a stuck loop cannot hang the request
+            with eventlet.Timeout(1, False):
+                self.thread.join()
+            self.thread = None
         print("Stopped live test data generation")
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 
 # Initialize components
 db = Database(Config.DATABASE_PATH)
-data_ingestion = BinanceDataIngestion(db)
+atexit.register(db.close)
+data_ingestion = BinanceDataIngestion(
+    db,
+    buffer_size=Config.MAX_BUFFER_SIZE,
+    emit_batch_size=Config.EMIT_BATCH_SIZE
+)
 analytics_service = QuantitativeAnalytics(db)
 test_data_generator = TestDataGenerator(db)
 
@@ -469,8 +794,13 @@ def get_initial_data():
     data = {}
     for symbol in active_symbols:
         df = db.get_recent_ticks(symbol, 100)
-        data[symbol] = df.to_dict('records')
-    return jsonify(data)
+        # Columnar payload: one array per field instead of one dict per tick
+        data[symbol] = {
+            't': np.ascontiguousarray(df['timestamp'].to_numpy()),
+            'p': np.ascontiguousarray(df['price'].to_numpy()),
+            'q': np.ascontiguousarray(df['size'].to_numpy())
+        }
+    return Response(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY), mimetype='application/json')
 
 @app.route('/api/start-collection', methods=['POST'])
 def start_collection():
@@ -499,26 +829,30 @@ def calculate_analytics():
         
         print(f"Calculating analytics for {symbol1} vs {symbol2}")
         
-        # Perform regression analysis
-        regression_result = analytics_service.pairwise_regression(symbol1, symbol2, timeframe)
-        
-        # Get recent data for spread calculation
+        # Fetch once; used for both the regression and the spread series
         df1 = db.get_recent_ticks(symbol1, 200)
         df2 = db.get_recent_ticks(symbol2, 200)
         
-        spread_series = []
+        # Perform regression analysis
+        regression_result = analytics_service.pairwise_regression(df1, df2, timeframe)
+        
+        zscore_result = None
         if not df1.empty and not df2.empty:
-            merged = pd.merge(df1, df2, on='timestamp', suffixes=('_1', '_2'))
+            # Raw ticks rarely share a millisecond, so pair each symbol1 tick with the
+            # latest symbol2 tick at most one second older
+            merged = pd.merge_asof(
+                df1, df2, on='timestamp', suffixes=('_1', '_2'),
+                tolerance=Config.ASOF_TOLERANCE_MS
+            ).dropna(subset=['price_2'])
             if not merged.empty and 'price_1' in merged.columns and 'price_2' in merged.columns:
                 hedge_ratio = regression_result.get('hedge_ratio', 1.0)
-                spread_series = (merged['price_2'] - hedge_ratio * merged['price_1']).values
+                zscore_result = analytics_service.pair_spread_zscore(
+                    symbol1, symbol2, merged, hedge_ratio, window_size
+                )
         
-        if len(spread_series) == 0:
+        if zscore_result is None:
             # Fallback for demo
-            spread_series = np.random.normal(0, 1, 50)
-        
-        # Calculate spread z-score
-        zscore_result = analytics_service.calculate_spread_zscore(spread_series, window_size)
+            zscore_result = analytics_service.calculate_spread_zscore(np.random.normal(0, 1, 50), window_size)
         
         # Rolling correlation
         correlation_result = analytics_service.rolling_correlation(symbol1, symbol2, window_size, timeframe)
@@ -580,6 +914,18 @@ def stop_test_data():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def set_attachment(response, filename):
+    """Content-Disposition for a download, quoted and RFC 5987-encoded the way send_file does"""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+^`|~')}"}
+    else:
+        names = {'filename': filename}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+    return response
+
 @app.route('/api/export-data')
 def export_data():
     symbol = request.args.get('symbol', 'btcusdt')
@@ -588,34 +934,52 @@ def export_data():
     df = db.get_recent_ticks(symbol, 1000)
     
     if format_type == 'csv':
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
+        def generate_csv(chunk_rows=256):
+            yield 'timestamp,price,size\n'
+            rows = zip(df['timestamp'].tolist(), df['price'].tolist(), df['size'].tolist())
+            lines = []
+            for ts, price, size in rows:
+                lines.append(f'{ts},{price},{size}\n')
+                if len(lines) == chunk_rows:
+                    yield ''.join(lines)
+                    lines = []
+            if lines:
+                yield ''.join(lines)
+        
+        return set_attachment(Response(generate_csv(), mimetype='text/csv'), f'{symbol}_data.csv')
+    
+    elif format_type == 'json':
+        columns = {column: np.ascontiguousarray(df[column].to_numpy()) for column in df.columns}
+        return Response(orjson.dumps(columns, option=orjson.OPT_SERIALIZE_NUMPY), mimetype='application/json')
+    
+    elif format_type == 'arrow':
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        sink.seek(0)
         return send_file(
-            io.BytesIO(output.getvalue().encode()),
-            mimetype='text/csv',
+            sink,
+            mimetype='application/vnd.apache.arrow.stream',
             as_attachment=True,
-            download_name=f'{symbol}_data.csv'
+            download_name=f'{symbol}_data.arrow'
         )
     
-    elif format_type == 'json':
-        return jsonify(df.to_dict('records'))
-    
     return jsonify({'error': 'Unsupported format'})
 
-# Callback for new tick data
-def on_new_tick(tick):
-    socketio.emit('tick_data', [tick])
-
-data_ingestion.add_callback(on_new_tick)
-
+# Sole emitter for live ticks: wakes when a batch is ready rather than polling
 def background_data_emitter():
     while True:
-        if is_collecting:
-            buffer_data = data_ingestion.get_recent_buffer(clear=True)
-            if buffer_data:
-                socketio.emit('tick_data', buffer_data)
-        time.sleep(0.5)
+        batch = data_ingestion.wait_for_batch(Config.EMIT_MAX_DELAY)
+        if len(batch['price']):
+            # Columnar payload: four short arrays instead of one dict per tick
+            socketio.emit('ticks', {
+                'sym': batch['symbol'].tolist(),
+                't': batch['timestamp'].tolist(),
+                'p': batch['price'].tolist(),
+                'q': batch['size'].tolist()
+            })
 
 if __name__ == '__main__':
     print("🚀 Starting Quantitative Analytics Dashboard...")
@@ -625,7 +989,6 @@ if __name__ == '__main__':
     test_data_generator.generate_test_data()
     
     # Start background emitter
-    emitter_thread = threading.Thread(target=background_data_emitter, daemon=True)
-    emitter_thread.start()
+    socketio.start_background_task(background_data_emitter)
     
     socketio.run(app, debug=True, host='0.0.0.0', port=5000, use_reloader=False)
\ No newline at end of file
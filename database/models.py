@@ -1,22 +1,52 @@
 import sqlite3
 import json
+import threading
 import pandas as pd
+from collections import deque
 from datetime import datetime
 
 class Database:
+    FLUSH_BATCH_SIZE = 1000
+    FLUSH_INTERVAL = 0.1
+    # 1: tick timestamps are INTEGER epoch milliseconds
+    SCHEMA_VERSION = 1
+    PRAGMAS = (
+        'journal_mode=WAL',
+        'synchronous=NORMAL',
+        'mmap_size=268435456',
+        'cache_size=-65536',
+        'temp_store=MEMORY',
+        'wal_autocheckpoint=10000',
+    )
+    
     def __init__(self, db_path):
         self.db_path = db_path
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._reader = None
+        
+        # Bumped on every write for a symbol so callers can tell when cached reads go stale
+        self._versions = {}
         self.init_database()
+        
+        # Ticks are queued here and written in batches by a background flusher
+        self.write_queue = deque()
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
     
     def init_database(self):
-        conn = sqlite3.connect(self.db_path)
+        # Long-lived connection shared by the batched writer
+        conn = self._connect()
+        self._write_conn = conn
         cursor = conn.cursor()
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS ticks (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 symbol TEXT NOT NULL,
-                timestamp DATETIME NOT NULL,
+                timestamp INTEGER NOT NULL,
                 price REAL NOT NULL,
                 size REAL NOT NULL,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP
@@ -49,21 +79,109 @@ class Database:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticks_symbol_time ON ticks(symbol, timestamp)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticks_time ON ticks(timestamp)')
         
+        # Tick timestamps are stored as epoch milliseconds. Older databases hold
+        # naive local-time ISO strings; convert them once, going through 'utc' so the
+        # host's offset is removed, and record it in user_version
+        if cursor.execute('PRAGMA user_version').fetchone()[0] < self.SCHEMA_VERSION:
+            cursor.execute('''
+                UPDATE ticks
+                SET timestamp = CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+                WHERE typeof(timestamp) = 'text'
+            ''')
+            cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        
         conn.commit()
-        conn.close()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in self.PRAGMAS:
+            conn.execute(f'PRAGMA {pragma}')
+        return conn
+    
+    def _read_conn(self):
+        # Callers must hold _read_lock; WAL lets reads run alongside the writer
+        if self._reader is None:
+            self._reader = self._connect()
+        return self._reader
     
     def save_tick(self, symbol, timestamp, price, size):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO ticks (symbol, timestamp, price, size) VALUES (?, ?, ?, ?)',
-            (symbol, timestamp, price, size)
-        )
-        conn.commit()
-        conn.close()
+        """Queue a tick; timestamp is epoch milliseconds"""
+        self.write_queue.append((symbol, timestamp, price, size))
+        if len(self.write_queue) >= self.FLUSH_BATCH_SIZE:
+            self._flush_event.set()
+    
+    def save_ticks_bulk(self, rows):
+        """Insert (symbol, timestamp, price, size) rows in one transaction, bypassing the queue.
+        Raises if the insert fails."""
+        self._insert_rows(rows)
+    
+    def flush(self):
+        """Write all queued ticks, one transaction per batch. A batch that fails on
+        bad data is retried row by row and the bad rows are logged and dropped; any
+        other failure puts the batch back at the front of the queue for the next flush."""
+        written = 0
+        while self.write_queue:
+            rows = []
+            while self.write_queue and len(rows) < self.FLUSH_BATCH_SIZE:
+                rows.append(self.write_queue.popleft())
+            try:
+                self._insert_rows(rows)
+            except (sqlite3.IntegrityError, sqlite3.InterfaceError):
+                written += self._insert_each(rows)
+                continue
+            except Exception as e:
+                print(f"Tick flush error, {len(rows)} rows re-queued: {e}")
+                self.write_queue.extendleft(reversed(rows))
+                break
+            written += len(rows)
+        return written
+    
+    def _insert_each(self, rows):
+        written = 0
+        for row in rows:
+            try:
+                self._insert_rows([row])
+                written += 1
+            except Exception as e:
+                print(f"Dropping tick {row}: {e}")
+        return written
+    
+    def _insert_rows(self, rows):
+        with self._write_lock, self._write_conn:
+            self._write_conn.executemany(
+                'INSERT INTO ticks (symbol, timestamp, price, size) VALUES (?, ?, ?, ?)',
+                rows
+            )
+        
+        # Only committed rows invalidate cached reads
+        for symbol in {row[0] for row in rows}:
+            self._versions[symbol] = self._versions.get(symbol, 0) + 1
+    
+    def get_tick_version(self, symbol):
+        """Counter that changes whenever ticks for the symbol are written"""
+        return self._versions.get(symbol, 0)
+    
+    def _flush_loop(self):
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.FLUSH_INTERVAL)
+            self._flush_event.clear()
+            self.flush()
+    
+    def close(self):
+        # Stop the flusher first so it cannot pop rows and then hit a closed connection
+        self._stop_event.set()
+        self._flush_event.set()
+        self._flusher.join()
+        self.flush()
+        with self._write_lock:
+            self._write_conn.close()
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
     
     def get_recent_ticks(self, symbol, limit=1000):
-        conn = sqlite3.connect(self.db_path)
+        """Latest ticks in ascending time order, timestamps in epoch milliseconds"""
         query = '''
             SELECT timestamp, price, size 
             FROM ticks 
@@ -71,18 +189,19 @@ class Database:
             ORDER BY timestamp DESC 
             LIMIT ?
         '''
-        df = pd.read_sql_query(query, conn, params=[symbol, limit])
-        conn.close()
-        return df
+        with self._read_lock:
+            df = pd.read_sql_query(query, self._read_conn(), params=[symbol, limit])
+        # Rows come back newest-first; reverse to ascending time
+        return df.iloc[::-1].reset_index(drop=True)
     
     def get_ticks_time_range(self, symbol, start_time, end_time):
-        conn = sqlite3.connect(self.db_path)
+        """Ticks between two epoch-millisecond bounds, inclusive"""
         query = '''
             SELECT timestamp, price, size 
             FROM ticks 
             WHERE symbol = ? AND timestamp BETWEEN ? AND ?
             ORDER BY timestamp
         '''
-        df = pd.read_sql_query(query, conn, params=[symbol, start_time, end_time])
-        conn.close()
+        with self._read_lock:
+            df = pd.read_sql_query(query, self._read_conn(), params=[symbol, start_time, end_time])
         return df
\ No newline at end of file
@@ -1,8 +1,7 @@
 # File: ingestor.py
 import websocket
-import json
-import time
-from threading import Thread, Lock
+import orjson
+from threading import Thread, Lock, Event
 from datetime import datetime
 
 # Import our database setup
@@ -15,10 +14,12 @@ SYMBOLS_TO_SUBSCRIBE = ["btcusdt", "ethusdt"]
 BINANCE_WEBSOCKET_URL = "wss://fstream.binance.com/stream?streams="
 # --- End Configuration ---
 
-# A thread-safe list to buffer ticks before batch inserting
+# A thread-safe list of row dicts to buffer ticks before batch inserting
 TICK_BUFFER = []
 BUFFER_LOCK = Lock()
-BUFFER_SIZE = 100  # Commit to DB every 100 ticks
+BUFFER_SIZE = 10000  # Commit to DB every 10000 ticks...
+FLUSH_INTERVAL = 2  # ...or every 2 seconds, whichever comes first
+BUFFER_FULL = Event()
 
 def get_stream_url():
     """Generates the full stream URL for all symbols."""
@@ -28,22 +29,24 @@ def get_stream_url():
 def on_message(ws, message):
     """Callback function when a message is received."""
     try:
-        data = json.loads(message)
+        data = orjson.loads(message)
         
         # Check if it's a trade message
         if data.get('e') == 'trade' or data.get('data', {}).get('e') == 'trade':
             trade_data = data.get('data', data) # Handle combined stream format
             
-            tick = Tick(
-                timestamp=datetime.utcfromtimestamp(trade_data['T'] / 1000.0),
-                symbol=trade_data['s'],
-                price=float(trade_data['p']),
-                size=float(trade_data['q'])
-            )
+            tick = {
+                'timestamp': datetime.utcfromtimestamp(trade_data['T'] / 1000.0),
+                'symbol': trade_data['s'],
+                'price': float(trade_data['p']),
+                'size': float(trade_data['q'])
+            }
             
             # Add tick to buffer safely
             with BUFFER_LOCK:
                 TICK_BUFFER.append(tick)
+                if len(TICK_BUFFER) >= BUFFER_SIZE:
+                    BUFFER_FULL.set()
                 
     except Exception as e:
         print(f"Error processing message: {e}\nMessage: {message}")
@@ -73,14 +76,15 @@ def run_websocket_client():
 def batch_insert_ticks():
     """
     A separate thread function to periodically 
-    insert ticks from the buffer into the database.
+    bulk insert ticks from the buffer into the database.
     """
     global TICK_BUFFER
     session = SessionLocal()
     
     while True:
         try:
-            time.sleep(2)  # Process buffer every 2 seconds
+            BUFFER_FULL.wait(FLUSH_INTERVAL)
+            BUFFER_FULL.clear()
             
             ticks_to_insert = []
             
@@ -91,7 +95,7 @@ def batch_insert_ticks():
                     TICK_BUFFER = []
             
             if len(ticks_to_insert) > 0:
-                session.add_all(ticks_to_insert)
+                session.bulk_insert_mappings(Tick, ticks_to_insert)
                 session.commit()
                 print(f"Committed {len(ticks_to_insert)} ticks to database.")
                 
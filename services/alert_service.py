@@ -1,6 +1,9 @@
+import itertools
 import threading
 import time
 from datetime import datetime
+import numpy as np
+from services.fanout import compile_fanout
 
 class AlertService:
     def __init__(self):
@@ -8,13 +11,38 @@ class AlertService:
         self.triggered_alerts = []
         self.is_monitoring = False
         self.alert_callbacks = []
+        self._fanout = compile_fanout(self.alert_callbacks)
+        self._ids = itertools.count(1)
+        self._alerts_by_id = {}
+        
+        # Per-symbol pending thresholds as ascending float64 arrays with parallel
+        # id arrays, so one searchsorted on the tick price splits off every hit
+        self._above = {}
+        self._above_ids = {}
+        self._below = {}
+        self._below_ids = {}
+        # Guards the arrays and alert state; callbacks run after it is released
+        self._lock = threading.Lock()
     
     def add_alert_callback(self, callback):
         self.alert_callbacks.append(callback)
+        self._fanout = compile_fanout(self.alert_callbacks)
+    
+    def _rebuild(self, symbol):
+        """Rebuild a symbol's threshold arrays from its pending alerts"""
+        for condition, thresholds, ids in (('above', self._above, self._above_ids),
+                                           ('below', self._below, self._below_ids)):
+            pending = [alert for alert in self.alerts
+                       if alert['symbol'] == symbol and alert['condition'] == condition
+                       and alert['is_active'] and not alert['triggered']]
+            values = np.array([alert['threshold'] for alert in pending], dtype=np.float64)
+            order = np.argsort(values, kind='stable')
+            thresholds[symbol] = values[order]
+            ids[symbol] = np.array([alert['id'] for alert in pending], dtype=np.int64)[order]
     
     def create_alert(self, name, condition, symbol, threshold):
         alert = {
-            'id': len(self.alerts) + 1,
+            'id': next(self._ids),
             'name': name,
             'condition': condition,
             'symbol': symbol,
@@ -23,39 +51,111 @@ class AlertService:
             'triggered': False,
             'created_at': datetime.now().isoformat()
         }
-        self.alerts.append(alert)
+        with self._lock:
+            self.alerts.append(alert)
+            self._alerts_by_id[alert['id']] = alert
+            if condition in ('above', 'below'):
+                self._rebuild(symbol)
         return alert
     
     def remove_alert(self, alert_id):
-        self.alerts = [alert for alert in self.alerts if alert['id'] != alert_id]
+        with self._lock:
+            self.alerts = [alert for alert in self.alerts if alert['id'] != alert_id]
+            alert = self._alerts_by_id.pop(alert_id, None)
+            if alert is not None and alert['symbol'] in self._above:
+                self._rebuild(alert['symbol'])
     
-    def check_price_alert(self, tick_data):
+    def _mark_triggered(self, hits):
+        """Mark (alert id, price) hits as triggered; call with the lock held"""
         triggered = []
-        for alert in self.alerts:
-            if not alert['is_active'] or alert['triggered']:
+        for alert_id, price in hits:
+            alert = self._alerts_by_id.get(alert_id)
+            if alert is None or not alert['is_active'] or alert['triggered']:
                 continue
+            alert['triggered'] = True
+            alert['triggered_at'] = datetime.now().isoformat()
+            alert['triggered_price'] = price
+            triggered.append(alert.copy())
+        return triggered
+    
+    def _notify(self, triggered):
+        fanout = self._fanout
+        for alert in triggered:
+            fanout(alert)
+        return triggered
+    
+    def check_price_alert(self, tick_data):
+        symbol = tick_data['symbol']
+        price = tick_data['price']
+        with self._lock:
+            above = self._above.get(symbol)
+            if above is None:
+                return []
+            below = self._below[symbol]
+            
+            # above: threshold < price is a prefix; below: threshold > price is a suffix
+            i = np.searchsorted(above, price, side='left')
+            j = np.searchsorted(below, price, side='right')
+            if i == 0 and j == len(below):
+                return []
+            
+            hits = self._above_ids[symbol][:i].tolist() + self._below_ids[symbol][j:].tolist()
+            self._above[symbol] = above[i:]
+            self._above_ids[symbol] = self._above_ids[symbol][i:]
+            self._below[symbol] = below[:j]
+            self._below_ids[symbol] = self._below_ids[symbol][:j]
+            triggered = self._mark_triggered((alert_id, price) for alert_id in hits)
+        
+        return self._notify(triggered)
+    
+    def check_price_alerts_batch(self, prices, syms, symbols=None):
+        """Evaluate alerts against a batch of ticks, where prices and syms are
+        parallel arrays in arrival order. syms holds symbol names, or symbol ids
+        into the symbols table when one is given, as in a drain of
+        BinanceDataIngestion.get_recent_buffer() (buf['price'], buf['symbol'],
+        buf['symbols']). Each alert fires at most once, on the first tick that
+        crosses it."""
+        prices = np.asarray(prices, dtype=np.float64)
+        syms = np.asarray(syms)
+        # Integer keys are ids into the symbols table; anything else is a name
+        by_id = symbols is not None and syms.dtype.kind in 'iu'
+        fired = []
+        with self._lock:
+            for key in np.unique(syms):
+                if by_id:
+                    if not 0 <= key < len(symbols):
+                        continue
+                    symbol = symbols[key]
+                else:
+                    symbol = str(key)
+                above = self._above.get(symbol)
+                if above is None:
+                    continue
+                below = self._below[symbol]
+                idx = np.flatnonzero(syms == key)
+                p = prices[idx]
                 
-            if alert['symbol'] == tick_data['symbol']:
-                price = tick_data['price']
-                threshold = alert['threshold']
+                # Only the thresholds the batch extremes cross can fire
+                i = np.searchsorted(above, p.max(), side='left')
+                j = np.searchsorted(below, p.min(), side='right')
                 
-                if alert['condition'] == 'above' and price > threshold:
-                    alert['triggered'] = True
-                    alert['triggered_at'] = datetime.now().isoformat()
-                    alert['triggered_price'] = price
-                    triggered.append(alert.copy())
-                    
-                elif alert['condition'] == 'below' and price < threshold:
-                    alert['triggered'] = True
-                    alert['triggered_at'] = datetime.now().isoformat()
-                    alert['triggered_price'] = price
-                    triggered.append(alert.copy())
+                if i > 0:
+                    first = (p[:, None] > above[None, :i]).argmax(axis=0)
+                    fired.extend(zip(idx[first].tolist(), self._above_ids[symbol][:i].tolist()))
+                    self._above[symbol] = above[i:]
+                    self._above_ids[symbol] = self._above_ids[symbol][i:]
+                if j < len(below):
+                    first = (p[:, None] < below[None, j:]).argmax(axis=0)
+                    fired.extend(zip(idx[first].tolist(), self._below_ids[symbol][j:].tolist()))
+                    self._below[symbol] = below[:j]
+                    self._below_ids[symbol] = self._below_ids[symbol][:j]
+            
+            fired.sort()
+            triggered = self._mark_triggered(
+                (alert_id, float(prices[tick_idx])) for tick_idx, alert_id in fired
+            )
         
-        for alert in triggered:
-            for callback in self.alert_callbacks:
-                callback(alert)
-        
-        return triggered
+        return self._notify(triggered)
     
     def start_monitoring(self):
         self.is_monitoring = True
@@ -1,21 +1,39 @@
 import pandas as pd
 import numpy as np
 from scipy import stats
-import statsmodels.api as sm
 from statsmodels.tsa.stattools import adfuller
+from collections import OrderedDict
+from functools import lru_cache
 from datetime import datetime, timedelta
+from services.kernels import basic_stats, rolling_corr, rolling_zscore, spread_stats
+
+@lru_cache(maxsize=128)
+def _adf_cached(values, n):
+    """ADF test on a float64 series passed as raw bytes so repeat calls hit the cache"""
+    series = np.frombuffer(values, dtype=np.float64, count=n)
+    # Fixed lag order instead of the AIC search, which refits one OLS per candidate lag
+    return adfuller(series, maxlag=max(1, int(n ** (1 / 3))), autolag=None, regression='c')
 
 class QuantitativeAnalytics:
+    RESAMPLE_CACHE_SIZE = 64
+    
     def __init__(self, db):
         self.db = db
+        # (symbol, timeframe) -> (tick version, resampled frame), least recently used first
+        self._resample_cache = OrderedDict()
     
-    def resample_ticks(self, df, interval='1m'):
+    def resample_ticks(self, df, interval='1m', keep_index=False):
         if df.empty or len(df) < 5:
             return pd.DataFrame()
             
         try:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df.set_index('timestamp', inplace=True)
+            # Epoch-ms integers view directly as datetime64 with no parsing
+            ts = df['timestamp'].to_numpy()
+            if ts.dtype.kind in 'iu':
+                index = pd.DatetimeIndex(ts.astype(np.int64).view('datetime64[ms]'), name='timestamp')
+            else:
+                index = pd.DatetimeIndex(pd.to_datetime(ts), name='timestamp')
+            df = df.set_index(index)
             
             if interval.endswith('s'):
                 seconds = int(interval[:-1])
@@ -26,29 +44,34 @@ class QuantitativeAnalytics:
             else:
                 rule = '1min'
             
-            # Use mean for OHLC if we don't have enough ticks
-            if len(df) < 10:
-                ohlc_df = df['price'].resample(rule).agg({
-                    'open': 'first',
-                    'high': 'max', 
-                    'low': 'min',
-                    'close': 'last'
-                }).reset_index()
-                volume = df['size'].resample(rule).sum().reset_index()
-                result = pd.merge(ohlc_df, volume, on='timestamp')
-            else:
-                ohlc = df['price'].resample(rule).ohlc()
-                volume = df['size'].resample(rule).sum()
-                result = ohlc
-                result['volume'] = volume
+            resampler = df.resample(rule)
+            result = resampler['price'].ohlc()
+            result['volume'] = resampler['size'].sum()
             
             result = result.dropna()
-            return result.reset_index()
+            return result if keep_index else result.reset_index()
             
         except Exception as e:
             print(f"Resampling error: {e}")
             return pd.DataFrame()
     
+    def _get_resampled(self, symbol, timeframe):
+        """Resampled recent ticks for a symbol, indexed by bar time and reused
+        until new ticks are written"""
+        key = (symbol, timeframe)
+        version = self.db.get_tick_version(symbol)
+        cached = self._resample_cache.get(key)
+        if cached is not None and cached[0] == version:
+            self._resample_cache.move_to_end(key)
+            return cached[1]
+        
+        resampled = self.resample_ticks(self.db.get_recent_ticks(symbol, 500), timeframe, keep_index=True)
+        self._resample_cache[key] = (version, resampled)
+        self._resample_cache.move_to_end(key)
+        if len(self._resample_cache) > self.RESAMPLE_CACHE_SIZE:
+            self._resample_cache.popitem(last=False)
+        return resampled
+    
     def calculate_basic_stats(self, df):
         if df.empty or len(df) < 2:
             return {
@@ -62,42 +85,34 @@ class QuantitativeAnalytics:
                 'vwap': 0
             }
             
-        prices = df['price'].values
-        if len(prices) < 2:
-            returns = np.array([0])
-        else:
-            returns = np.diff(np.log(prices))
-        
-        volume_sum = df['size'].sum()
-        vwap = (df['price'] * df['size']).sum() / volume_sum if volume_sum > 0 else prices[-1] if len(prices) > 0 else 0
+        prices = df['price'].to_numpy(dtype=np.float64, copy=False)
+        sizes = df['size'].to_numpy(dtype=np.float64, copy=False)
+        low, high, mean, std, volatility, volume_sum, price_volume = basic_stats(
+            np.ascontiguousarray(prices), np.ascontiguousarray(sizes)
+        )
+        vwap = price_volume / volume_sum if volume_sum > 0 else prices[-1]
         
         return {
-            'current_price': float(prices[-1]) if len(prices) > 0 else 0,
-            'high': float(np.max(prices)) if len(prices) > 0 else 0,
-            'low': float(np.min(prices)) if len(prices) > 0 else 0,
-            'mean': float(np.mean(prices)) if len(prices) > 0 else 0,
-            'std': float(np.std(prices)) if len(prices) > 0 else 0,
-            'volatility': float(np.std(returns)) * 100 if len(returns) > 0 else 0,
+            'current_price': float(prices[-1]),
+            'high': float(high),
+            'low': float(low),
+            'mean': float(mean),
+            'std': float(std),
+            'volatility': float(volatility) * 100,
             'volume': float(volume_sum),
             'vwap': float(vwap)
         }
     
     def pairwise_regression(self, symbol1, symbol2, timeframe='1m'):
         try:
-            df1 = self.db.get_recent_ticks(symbol1, 500)  # Reduced for stability
-            df2 = self.db.get_recent_ticks(symbol2, 500)
-            
-            if df1.empty or df2.empty or len(df1) < 10 or len(df2) < 10:
-                return None
-            
-            df1_resampled = self.resample_ticks(df1, timeframe)
-            df2_resampled = self.resample_ticks(df2, timeframe)
+            df1_resampled = self._get_resampled(symbol1, timeframe)
+            df2_resampled = self._get_resampled(symbol2, timeframe)
             
             if df1_resampled.empty or df2_resampled.empty:
                 return None
             
             # Use close prices for regression
-            merged = pd.merge(df1_resampled, df2_resampled, on='timestamp', suffixes=('_1', '_2'))
+            merged = df1_resampled.join(df2_resampled, how='inner', lsuffix='_1', rsuffix='_2')
             
             if len(merged) < 5:
                 return None
@@ -106,29 +121,40 @@ class QuantitativeAnalytics:
             if 'close_1' not in merged.columns or 'close_2' not in merged.columns:
                 return None
             
-            X = merged['close_1'].values
-            y = merged['close_2'].values
-            
-            # Add constant for intercept
-            X = sm.add_constant(X)
+            x = merged['close_1'].to_numpy(dtype=np.float64)
+            y = merged['close_2'].to_numpy(dtype=np.float64)
             
             # Check for valid data
-            if np.any(np.isnan(X)) or np.any(np.isnan(y)):
+            if np.any(np.isnan(x)) or np.any(np.isnan(y)):
                 return None
-                
-            model = sm.OLS(y, X).fit()
             
-            hedge_ratio = model.params[1] if len(model.params) > 1 else 0
-            spread = y - hedge_ratio * X[:, 1]
+            # Only params, R^2 and the F-test p-value are used, so solve the
+            # 2-column least squares directly instead of fitting a full OLS model
+            X = np.column_stack((np.ones_like(x), x))
+            beta = np.linalg.lstsq(X, y, rcond=None)[0]
+            intercept, hedge_ratio = beta
+            
+            # The OLS residual is the spread minus the intercept, and the spread's
+            # mean equals the intercept, so one pass gives both SS_res and the spread stats
+            n = len(y)
+            spread_mean, spread_std, spread_last = spread_stats(x, y, hedge_ratio)
+            ss_res = n * spread_std ** 2
+            ss_tot = float(np.sum((y - y.mean()) ** 2))
+            r_squared = 1 - ss_res / ss_tot if ss_tot > 0 else 0.0
+            if n > 2 and ss_res > 0:
+                f_stat = (ss_tot - ss_res) / (ss_res / (n - 2))
+                p_value = float(stats.f.sf(f_stat, 1, n - 2))
+            else:
+                p_value = 0.0
             
             return {
                 'hedge_ratio': float(hedge_ratio),
-                'intercept': float(model.params[0]),
-                'r_squared': float(model.rsquared),
-                'p_value': float(model.f_pvalue) if hasattr(model, 'f_pvalue') else 0.0,
-                'spread_mean': float(np.mean(spread)) if len(spread) > 0 else 0,
-                'spread_std': float(np.std(spread)) if len(spread) > 0 else 0,
-                'current_spread': float(spread[-1]) if len(spread) > 0 else 0
+                'intercept': float(intercept),
+                'r_squared': float(r_squared),
+                'p_value': p_value,
+                'spread_mean': float(spread_mean),
+                'spread_std': float(spread_std),
+                'current_spread': float(spread_last)
             }
             
         except Exception as e:
@@ -145,16 +171,15 @@ class QuantitativeAnalytics:
             }
         
         try:
-            spread_series = pd.Series(spread_series)
-            rolling_mean = spread_series.rolling(window=min(window, len(spread_series))).mean()
-            rolling_std = spread_series.rolling(window=min(window, len(spread_series))).std()
-            zscore = (spread_series - rolling_mean) / rolling_std
+            spread = np.ascontiguousarray(spread_series, dtype=np.float64)
+            # Sample std (ddof=1) to match pandas' rolling().std()
+            zscore, rolling_mean, rolling_std = rolling_zscore(spread, window, 1)
             
             return {
-                'current_zscore': float(zscore.iloc[-1]) if not pd.isna(zscore.iloc[-1]) else 0,
-                'zscore_series': zscore.dropna().tolist(),
-                'mean': float(rolling_mean.iloc[-1]) if not pd.isna(rolling_mean.iloc[-1]) else 0,
-                'std': float(rolling_std.iloc[-1]) if not pd.isna(rolling_std.iloc[-1]) else 0
+                'current_zscore': float(zscore[-1]) if not np.isnan(zscore[-1]) else 0,
+                'zscore_series': zscore[window - 1:].tolist(),
+                'mean': float(rolling_mean[-1]) if not np.isnan(rolling_mean[-1]) else 0,
+                'std': float(rolling_std[-1]) if not np.isnan(rolling_std[-1]) else 0
             }
         except Exception as e:
             print(f"Z-score calculation error: {e}")
@@ -184,7 +209,8 @@ class QuantitativeAnalytics:
                     'is_stationary': False
                 }
                 
-            result = adfuller(series_clean)
+            values = series_clean.to_numpy(dtype=np.float64)
+            result = _adf_cached(values.tobytes(), len(values))
             
             return {
                 'test_statistic': float(result[0]),
@@ -203,19 +229,13 @@ class QuantitativeAnalytics:
     
     def rolling_correlation(self, symbol1, symbol2, window=20, timeframe='1m'):
         try:
-            df1 = self.db.get_recent_ticks(symbol1, 500)
-            df2 = self.db.get_recent_ticks(symbol2, 500)
-            
-            if df1.empty or df2.empty:
-                return None
-            
-            df1_resampled = self.resample_ticks(df1, timeframe)
-            df2_resampled = self.resample_ticks(df2, timeframe)
+            df1_resampled = self._get_resampled(symbol1, timeframe)
+            df2_resampled = self._get_resampled(symbol2, timeframe)
             
             if df1_resampled.empty or df2_resampled.empty:
                 return None
             
-            merged = pd.merge(df1_resampled, df2_resampled, on='timestamp', suffixes=('_1', '_2'))
+            merged = df1_resampled.join(df2_resampled, how='inner', lsuffix='_1', rsuffix='_2')
             
             if len(merged) < window or 'close_1' not in merged.columns or 'close_2' not in merged.columns:
                 return {
@@ -224,12 +244,17 @@ class QuantitativeAnalytics:
                     'mean_correlation': 0
                 }
             
-            corr = merged['close_1'].rolling(window=min(window, len(merged))).corr(merged['close_2'])
+            corr = rolling_corr(
+                merged['close_1'].to_numpy(dtype=np.float64),
+                merged['close_2'].to_numpy(dtype=np.float64),
+                window
+            )
+            valid = corr[~np.isnan(corr)]
             
             return {
-                'current_correlation': float(corr.iloc[-1]) if not pd.isna(corr.iloc[-1]) else 0,
-                'correlation_series': corr.dropna().tolist(),
-                'mean_correlation': float(corr.mean()) if not pd.isna(corr.mean()) else 0
+                'current_correlation': float(corr[-1]) if not np.isnan(corr[-1]) else 0,
+                'correlation_series': valid.tolist(),
+                'mean_correlation': float(valid.mean()) if len(valid) > 0 else 0
             }
         except Exception as e:
             print(f"Correlation error: {e}")
@@ -1,48 +1,118 @@
-import websocket
 import json
+import websocket
 import threading
-import time
-from datetime import datetime
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from services.fanout import compile_fanout
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 class BinanceDataIngestion:
-    def __init__(self, db, symbols=None):
+    STREAM_URL = "wss://fstream.binance.com/stream?streams="
+    MAX_PENDING = 10000
+    
+    def __init__(self, db, symbols=None, buffer_size=1000):
         self.db = db
         self.symbols = symbols or []
-        self.ws_connections = {}
+        # One combined-stream connection carries every symbol
+        self.ws = None
+        self._request_id = 0
+        # Symbols added while the socket is not yet open, sent from on_open
+        self._pending_subs = []
+        self._sub_lock = threading.Lock()
         self.is_running = False
-        self.buffer = []
         self.buffer_lock = threading.Lock()
         self.callbacks = []
+        self._fanout = compile_fanout(self.callbacks)
         
+        # Columnar ring buffer of recent ticks; _head counts every tick written
+        # and _tail marks the last clear, both as absolute positions
+        self.buffer_size = buffer_size
+        self._ts_ms = np.empty(buffer_size, dtype=np.int64)
+        self._prices = np.empty(buffer_size, dtype=np.float64)
+        self._sizes = np.empty(buffer_size, dtype=np.float64)
+        self._sym = np.empty(buffer_size, dtype=np.int8)
+        self._sym_table = {}
+        self._sym_names = []
+        self._head = 0
+        self._tail = 0
+        
+        # Parsing, enqueueing and callbacks run on a single worker so the socket
+        # thread only reads frames; one worker keeps ticks in wire order
+        self._exec = None
+        self._pending = None
+        self._start_worker()
+        
+    def _start_worker(self):
+        self._pending = threading.BoundedSemaphore(self.MAX_PENDING)
+        self._exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tick-worker')
+    
     def add_callback(self, callback):
         self.callbacks.append(callback)
+        self._fanout = compile_fanout(self.callbacks)
     
     def normalize_tick(self, data):
         return {
             'symbol': data['s'].lower(),
-            'timestamp': datetime.fromtimestamp(data['E'] / 1000).isoformat(),
+            'timestamp': data['E'],
             'price': float(data['p']),
             'size': float(data['q'])
         }
     
+    def _symbol_id(self, symbol):
+        sid = self._sym_table.get(symbol)
+        if sid is None:
+            sid = len(self._sym_names)
+            self._sym_table[symbol] = sid
+            self._sym_names.append(symbol)
+        return sid
+    
     def on_message(self, ws, message):
+        # Cheap substring test skips non-trade events before they are queued
+        if '"e":"trade"' not in message:
+            return
+        executor = self._exec
+        pending = self._pending
+        if executor is None:
+            return
+        
+        # Hold the socket thread back when the worker falls behind rather than
+        # queueing without bound; give up if stop() retires this executor
+        while not pending.acquire(timeout=0.5):
+            if self._exec is not executor:
+                return
         try:
-            data = json.loads(message)
-            if data.get('e') == 'trade':
+            executor.submit(self._process_raw, message, pending)
+        except RuntimeError:
+            # Shut down by stop() between the check and the submit
+            pending.release()
+    
+    def _process_raw(self, message, pending):
+        try:
+            # Combined streams wrap each event as {"stream": ..., "data": {...}}
+            data = json_loads(message).get('data')
+            if data is not None and data.get('e') == 'trade':
                 tick = self.normalize_tick(data)
                 
                 self.db.save_tick(tick['symbol'], tick['timestamp'], tick['price'], tick['size'])
                 
                 with self.buffer_lock:
-                    self.buffer.append(tick)
-                    if len(self.buffer) > 1000:
-                        self.buffer.pop(0)
+                    i = self._head % self.buffer_size
+                    self._ts_ms[i] = tick['timestamp']
+                    self._prices[i] = tick['price']
+                    self._sizes[i] = tick['size']
+                    self._sym[i] = self._symbol_id(tick['symbol'])
+                    self._head += 1
                 
-                for callback in self.callbacks:
-                    callback(tick)
+                self._fanout(tick)
                     
         except Exception as e:
             print(f"Error processing message: {e}")
+        finally:
+            pending.release()
     
     def on_error(self, ws, error):
         print(f"WebSocket error: {error}")
@@ -52,46 +122,99 @@ class BinanceDataIngestion:
     
     def on_open(self, ws):
         print("WebSocket connection opened")
+        self._send_pending_subs()
     
     def start_symbol(self, symbol):
-        if symbol in self.ws_connections:
+        """Subscribe a symbol on the combined stream"""
+        with self._sub_lock:
+            if symbol in self.symbols or symbol in self._pending_subs:
+                return
+            if self.ws is None:
+                # Not connected yet; start() builds the stream URL from self.symbols
+                self.symbols.append(symbol)
+                return
+            self._pending_subs.append(symbol)
+        self._send_pending_subs()
+    
+    def _send_pending_subs(self):
+        """SUBSCRIBE queued symbols; a symbol joins self.symbols only once its send succeeds"""
+        with self._sub_lock:
+            while self._pending_subs and self.ws is not None:
+                symbol = self._pending_subs[0]
+                self._request_id += 1
+                try:
+                    self.ws.send(json.dumps({
+                        'method': 'SUBSCRIBE',
+                        'params': [f"{symbol}@trade"],
+                        'id': self._request_id
+                    }))
+                except Exception as e:
+                    # Usually the socket is not open yet; on_open retries the queue
+                    print(f"Subscribe error for {symbol}: {e}")
+                    return
+                self._pending_subs.pop(0)
+                self.symbols.append(symbol)
+    
+    def start(self, symbols):
+        if self.ws is not None:
             return
-            
-        import websocket
-        ws_url = f"wss://fstream.binance.com/ws/{symbol}@trade"
-        ws = websocket.WebSocketApp(
-            ws_url,
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close,
-            on_open=self.on_open
-        )
         
-        def run_websocket():
-            ws.run_forever()
+        self.is_running = True
+        if self._exec is None:
+            self._start_worker()
         
-        thread = threading.Thread(target=run_websocket)
+        with self._sub_lock:
+            # Keep symbols added before start() or left unsubscribed by a previous run
+            self.symbols = list(dict.fromkeys([*self.symbols, *self._pending_subs, *symbols]))
+            self._pending_subs.clear()
+            
+            ws_url = self.STREAM_URL + '/'.join(f"{symbol}@trade" for symbol in self.symbols)
+            self.ws = websocket.WebSocketApp(
+                ws_url,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close,
+                on_open=self.on_open
+            )
+        
+        thread = threading.Thread(target=self.ws.run_forever)
         thread.daemon = True
         thread.start()
-        
-        self.ws_connections[symbol] = ws
-    
-    def start(self, symbols):
-        self.symbols = symbols
-        self.is_running = True
-        for symbol in symbols:
-            self.start_symbol(symbol)
-            time.sleep(0.1)
     
     def stop(self):
         self.is_running = False
-        for ws in self.ws_connections.values():
-            ws.close()
-        self.ws_connections.clear()
+        if self.ws is not None:
+            self.ws.close()
+            self.ws = None
+        
+        executor, self._exec = self._exec, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _ring_slice(self, arr, start, stop):
+        a = start % self.buffer_size
+        b = stop % self.buffer_size
+        if stop - start == self.buffer_size or a > b:
+            return np.concatenate((arr[a:], arr[:b]))
+        return arr[a:b].copy()
+    
+    def symbol_id(self, symbol):
+        """Buffer id for a symbol, or None if no tick for it has been seen"""
+        return self._sym_table.get(symbol)
     
     def get_recent_buffer(self, clear=False):
+        """Ticks since the last clear as column arrays; 'symbol' holds ids
+        from symbol_id() and 'symbols' maps them back to names"""
         with self.buffer_lock:
-            buffer_copy = self.buffer.copy()
+            start = max(self._tail, self._head - self.buffer_size)
+            stop = self._head
+            buffer_copy = {
+                'symbol': self._ring_slice(self._sym, start, stop),
+                'timestamp': self._ring_slice(self._ts_ms, start, stop),
+                'price': self._ring_slice(self._prices, start, stop),
+                'size': self._ring_slice(self._sizes, start, stop),
+                'symbols': list(self._sym_names)
+            }
             if clear:
-                self.buffer.clear()
+                self._tail = stop
         return buffer_copy
\ No newline at end of file
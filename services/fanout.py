@@ -0,0 +1,13 @@
+def compile_fanout(callbacks):
+    """Build one function that calls every callback with a single argument.
+
+    The calls are unrolled into straight-line code with each callback bound
+    as a default argument, so the hot path has no list iteration and no
+    global or attribute lookups.
+    """
+    callbacks = tuple(callbacks)
+    params = ''.join(f', c{i}=c{i}' for i in range(len(callbacks)))
+    body = ''.join(f'    c{i}(t)\n' for i in range(len(callbacks))) or '    pass\n'
+    namespace = {f'c{i}': callback for i, callback in enumerate(callbacks)}
+    exec(f'def fanout(t{params}):\n{body}', namespace)
+    return namespace['fanout']
@@ -0,0 +1,208 @@
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def regress(X, y):
+    """Single-pass OLS of y on X using running (Welford) co-moments.
+
+    Returns (slope, intercept, r_squared, spread_last, spread_mean, spread_std)
+    where spread = y - slope * X. slope is NaN when X has no variance.
+    """
+    n = 0
+    mx = 0.0
+    my = 0.0
+    m2x = 0.0
+    m2y = 0.0
+    cxy = 0.0
+    for i in range(X.shape[0]):
+        n += 1
+        dx = X[i] - mx
+        dy = y[i] - my
+        mx += dx / n
+        my += dy / n
+        m2x += dx * (X[i] - mx)
+        m2y += dy * (y[i] - my)
+        cxy += dx * (y[i] - my)
+
+    if n == 0 or m2x == 0.0:
+        return np.nan, np.nan, 0.0, 0.0, 0.0, 0.0
+
+    slope = cxy / m2x
+    intercept = my - slope * mx
+    r_squared = cxy * cxy / (m2x * m2y) if m2y != 0.0 else 0.0
+
+    # var(y - b*X) expanded in terms of the co-moments
+    spread_var = (m2y - 2.0 * slope * cxy + slope * slope * m2x) / n
+    spread_std = np.sqrt(max(spread_var, 0.0))
+    spread_last = y[n - 1] - slope * X[n - 1]
+    return slope, intercept, r_squared, spread_last, intercept, spread_std
+
+
+@njit(cache=True)
+def rolling_zscore(x, window, ddof=0):
+    """Rolling mean, std and z-score over a sliding window in one pass.
+
+    Uses Welford add/remove updates, so each step is O(1). The first
+    window - 1 outputs are NaN. The z-score is 0 where the window has no
+    variance.
+    """
+    n = x.shape[0]
+    z = np.full(n, np.nan)
+    mean_out = np.full(n, np.nan)
+    std_out = np.full(n, np.nan)
+    if window < 1 or window <= ddof:
+        return z, mean_out, std_out
+
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        # Add the incoming point
+        count += 1
+        delta = x[i] - mean
+        mean += delta / count
+        m2 += delta * (x[i] - mean)
+
+        # Evict the point leaving the window
+        if count > window:
+            old = x[i - window]
+            count -= 1
+            delta = old - mean
+            mean -= delta / count
+            m2 -= delta * (old - mean)
+
+        if count == window:
+            std = np.sqrt(max(m2, 0.0) / (count - ddof))
+            mean_out[i] = mean
+            std_out[i] = std
+            z[i] = (x[i] - mean) / std if std > 0.0 else 0.0
+
+    return z, mean_out, std_out
+
+
+@njit(cache=True)
+def rolling_corr(x, y, window):
+    """Pearson correlation of x and y over a sliding window in one pass.
+
+    Keeps windowed Welford co-moments with add/remove updates, so each step
+    is O(1). Outputs are NaN before the window fills and where either side
+    has no variance.
+    """
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    if window < 2:
+        return out
+
+    count = 0
+    mx = 0.0
+    my = 0.0
+    m2x = 0.0
+    m2y = 0.0
+    cxy = 0.0
+    for i in range(n):
+        count += 1
+        dx = x[i] - mx
+        dy = y[i] - my
+        mx += dx / count
+        my += dy / count
+        m2x += dx * (x[i] - mx)
+        m2y += dy * (y[i] - my)
+        cxy += dx * (y[i] - my)
+
+        if count > window:
+            ox = x[i - window]
+            oy = y[i - window]
+            count -= 1
+            dx = ox - mx
+            dy = oy - my
+            mx -= dx / count
+            my -= dy / count
+            m2x -= dx * (ox - mx)
+            m2y -= dy * (oy - my)
+            cxy -= dx * (oy - my)
+
+        # Evictions leave rounding residue in M2, so a flat window is
+        # detected relative to the mean rather than as exactly zero
+        if (count == window and m2x > 1e-12 * count * mx * mx
+                and m2y > 1e-12 * count * my * my):
+            r = cxy / np.sqrt(m2x * m2y)
+            out[i] = min(1.0, max(-1.0, r))
+
+    return out
+
+
+@njit(cache=True)
+def spread_stats(x, y, slope):
+    """Mean, population std and last value of y - slope * x in one pass,
+    without materializing the spread array."""
+    n = x.shape[0]
+    mean = 0.0
+    m2 = 0.0
+    s = 0.0
+    for i in range(n):
+        s = y[i] - slope * x[i]
+        delta = s - mean
+        mean += delta / (i + 1)
+        m2 += delta * (s - mean)
+    std = np.sqrt(m2 / n) if n > 0 else 0.0
+    return mean, std, s
+
+
+@njit(cache=True, fastmath=True)
+def basic_stats(price, size):
+    """Price/volume summary statistics in one streaming pass.
+
+    Returns (low, high, mean, std, logret_std, volume, price_volume) with
+    population standard deviations, matching np.std.
+    """
+    n = price.shape[0]
+    low = price[0]
+    high = price[0]
+    mean = 0.0
+    m2 = 0.0
+    ret_mean = 0.0
+    ret_m2 = 0.0
+    volume = 0.0
+    price_volume = 0.0
+    prev_log = np.log(price[0])
+    for i in range(n):
+        p = price[i]
+        if p < low:
+            low = p
+        if p > high:
+            high = p
+        delta = p - mean
+        mean += delta / (i + 1)
+        m2 += delta * (p - mean)
+        volume += size[i]
+        price_volume += p * size[i]
+
+        if i > 0:
+            log_p = np.log(p)
+            r = log_p - prev_log
+            prev_log = log_p
+            delta = r - ret_mean
+            ret_mean += delta / i
+            ret_m2 += delta * (r - ret_mean)
+
+    std = np.sqrt(m2 / n)
+    logret_std = np.sqrt(ret_m2 / (n - 1)) if n > 1 else 0.0
+    return low, high, mean, std, logret_std, volume, price_volume
+
+
+# Pay the JIT cost once at import rather than on the first request. Numba
+# compiles a separate specialization for read-only arrays (pandas hands those
+# out under copy-on-write) and for calls that omit a defaulted argument, so
+# every form the callers use is warmed here.
+_writable = np.arange(1, 5, dtype=np.float64)
+_readonly = _writable.copy()
+_readonly.flags.writeable = False
+for _warmup in (_writable, _readonly):
+    regress(_warmup, _warmup)
+    rolling_zscore(_warmup, 2, 0)
+    rolling_zscore(_warmup, 2, 1)
+    rolling_zscore(_warmup, 2)
+    rolling_corr(_warmup, _warmup, 2)
+    spread_stats(_warmup, _warmup, 1.0)
+    basic_stats(_warmup, _warmup)
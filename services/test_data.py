@@ -1,7 +1,8 @@
 import threading
 import time
 import random
-from datetime import datetime, timedelta
+import numpy as np
+from itertools import repeat
 from database.models import Database
 
 class TestDataGenerator:
@@ -22,15 +23,18 @@ class TestDataGenerator:
             'solusdt': 150
         }
         
+        # Epoch ms, one minute apart, ending a minute before now
+        n = 100
+        timestamps = (int(time.time() * 1000) - 60000 * np.arange(n, 0, -1)).tolist()
+        rng = np.random.default_rng()
+        
         for symbol in symbols:
             base_price = base_prices.get(symbol, 100)
-            # Generate some historical data
-            for i in range(100):
-                timestamp = (datetime.now() - timedelta(minutes=100-i)).isoformat()
-                price = base_price * (1 + random.uniform(-0.02, 0.02))
-                size = random.uniform(0.1, 5.0)
-                self.db.save_tick(symbol, timestamp, price, size)
-                
+            # Generate some historical data in one draw and one transaction per symbol
+            prices = base_price * (1 + rng.uniform(-0.02, 0.02, n))
+            sizes = rng.uniform(0.1, 5.0, n)
+            self.db.save_ticks_bulk(list(zip(repeat(symbol), timestamps, prices.tolist(), sizes.tolist())))
+        
         print(f"Generated test data for {len(symbols)} symbols")
     
     def start_live_test_data(self, symbols=None):
@@ -41,28 +45,37 @@ class TestDataGenerator:
         self.is_running = True
         
         def generate_loop():
+            # Resolved once per run, outside the loop. Kept out of module scope because
+            # importing app runs eventlet.monkey_patch() and opens the tick database
+            from app import socketio
+            
             base_prices = {
                 'btcusdt': 60000,
                 'ethusdt': 3500
             }
+            bases = [base_prices.get(symbol, 100) for symbol in symbols]
+            
+            # Columnar 'ticks' payload, filled in place every second
+            batch = {
+                'sym': list(symbols),
+                't': [0] * len(symbols),
+                'p': [0.0] * len(symbols),
+                'q': [0.0] * len(symbols)
+            }
             
             while self.is_running:
-                for symbol in symbols:
-                    base_price = base_prices.get(symbol, 100)
-                    price = base_price * (1 + random.uniform(-0.01, 0.01))
-                    size = random.uniform(0.1, 2.0)
-                    timestamp = datetime.now().isoformat()
+                timestamp = int(time.time() * 1000)
+                for i, symbol in enumerate(symbols):
+                    price = bases[i] * (1 + random.random() * 0.02 - 0.01)
+                    size = 0.1 + random.random() * 1.9
                     self.db.save_tick(symbol, timestamp, price, size)
                     
-                    # Simulate WebSocket callback
-                    from app import socketio
-                    socketio.emit('tick_data', [{
-                        'symbol': symbol,
-                        'timestamp': timestamp,
-                        'price': price,
-                        'size': size
-                    }])
+                    batch['t'][i] = timestamp
+                    batch['p'][i] = price
+                    batch['q'][i] = size
                 
+                # Simulate WebSocket callback
+                socketio.emit('ticks', batch)
                 time.sleep(1)  # Generate data every second
         
         self.thread = threading.Thread(target=generate_loop)
@@ -39,8 +39,14 @@ class QuantAnalyticsApp {
             this.showNotification('Disconnected from server', 'error');
         });
 
-        this.socket.on('tick_data', (data) => {
-            this.handleTickData(data);
+        this.socket.on('ticks', (batch) => {
+            // Batches arrive as parallel arrays: sym, t (epoch ms), p, q
+            this.handleTickData(batch.t.map((timestamp, i) => ({
+                symbol: batch.sym[i],
+                timestamp: timestamp,
+                price: batch.p[i],
+                size: batch.q[i]
+            })));
         });
 
         this.socket.on('analytics_result', (result) => {
@@ -227,7 +233,17 @@ class QuantAnalyticsApp {
         try {
             const response = await fetch('/api/initial-data');
             const data = await response.json();
-            this.currentData = data;
+            
+            // Expand the columnar payload into per-tick objects
+            this.currentData = {};
+            Object.entries(data).forEach(([symbol, cols]) => {
+                this.currentData[symbol] = cols.t.map((timestamp, i) => ({
+                    symbol: symbol,
+                    timestamp: timestamp,
+                    price: cols.p[i],
+                    size: cols.q[i]
+                }));
+            });
             
             this.updateRealTimeStats();
             
@@ -0,0 +1,59 @@
+import time
+
+from services.alert_service import AlertService
+from services.data_ingestion import BinanceDataIngestion
+
+
+class _NullDb:
+    def save_tick(self, symbol, timestamp, price, size):
+        pass
+
+
+def _trade(symbol, ts, price):
+    return ('{"stream":"%s@trade","data":{"e":"trade","E":%d,"s":"%s","p":"%s","q":"1"}}'
+            % (symbol.lower(), ts, symbol, price))
+
+
+def _drain(ingestion, expected, timeout=2.0):
+    # Frames are parsed on the ingestion worker thread
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with ingestion.buffer_lock:
+            if ingestion._head - ingestion._tail >= expected:
+                break
+        time.sleep(0.01)
+    return ingestion.get_recent_buffer(clear=True)
+
+
+def test_batch_check_on_buffer_drain():
+    ingestion = BinanceDataIngestion(_NullDb())
+    try:
+        for i, (symbol, price) in enumerate([('ETHUSDT', 3000), ('BTCUSDT', 99), ('BTCUSDT', 101), ('ETHUSDT', 2900)]):
+            ingestion.on_message(None, _trade(symbol, 1000 + i, price))
+        buf = _drain(ingestion, 4)
+    finally:
+        ingestion.stop()
+
+    alerts = AlertService()
+    fired = []
+    alerts.add_alert_callback(fired.append)
+    alerts.create_alert('btc up', 'above', 'btcusdt', 100)
+    alerts.create_alert('eth down', 'below', 'ethusdt', 2950)
+    alerts.create_alert('sol up', 'above', 'solusdt', 1)
+
+    triggered = alerts.check_price_alerts_batch(buf['price'], buf['symbol'], buf['symbols'])
+
+    assert [(a['name'], a['triggered_price']) for a in triggered] == [('btc up', 101.0), ('eth down', 2900.0)]
+    assert fired == triggered
+    # Each alert fires once
+    assert alerts.check_price_alerts_batch(buf['price'], buf['symbol'], buf['symbols']) == []
+
+
+def test_batch_check_skips_unknown_ids_and_accepts_names():
+    alerts = AlertService()
+    alerts.create_alert('btc up', 'above', 'btcusdt', 100)
+
+    assert alerts.check_price_alerts_batch([150.0, 150.0], [5, -1], ['btcusdt']) == []
+    # Names are used as names even when a symbols table is passed
+    triggered = alerts.check_price_alerts_batch([150.0], ['btcusdt'], ['ethusdt'])
+    assert [a['name'] for a in triggered] == ['btc up']